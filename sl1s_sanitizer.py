@@ -4,12 +4,27 @@ SL1S Sanitizer - Validates SL1S 3D printing files against common issues
 Checks for proper structure, file presence, naming conventions, and configuration consistency
 """
 
-import os
+import io
+import itertools
+import lzma
 import sys
 import zipfile
+import zlib
 import configparser
 from pathlib import Path
-import re
+
+# Layer images are named <base><five digits>.<ext>, e.g. Cube_Test00042.png
+_LAYER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Standard thumbnail/preview folders, ignored for structure and layer validation
+_THUMBNAIL_PREFIX = 'thumbnail/'
+_PREVIEW_PREFIXES = (_THUMBNAIL_PREFIX, 'preview/')
+# Layer numbers have five digits, so they all fall in range(_LAYER_NUMBER_LIMIT)
+_LAYER_NUMBER_LIMIT = 100000
+
+def _parse_five_digits(s):
+    """Convert a five-character ASCII digit string (e.g. '00042') to an int without int()"""
+    return ((ord(s[0]) - 48) * 10000 + (ord(s[1]) - 48) * 1000 + (ord(s[2]) - 48) * 100
+            + (ord(s[3]) - 48) * 10 + (ord(s[4]) - 48))
 
 class SL1SSanitizer:
     def __init__(self, sl1s_file_path):
@@ -18,6 +33,18 @@ class SL1SSanitizer:
         self.warnings = []
         self.image_files = []
         self.config = None
+        self._config_flat = {}
+        self._num_fast = None
+        self._zf = None
+        # Archive entries grouped by _classify_entries
+        self._has_root_entry = False
+        self._subfolders = set()
+        self._by_basename = {}
+        self._layer_images = []
+        self._layer_lowers = []
+        # Parsed layer names, kept for the config consistency check
+        self._last_layer_number = None
+        self._layer_base = None
         
     def validate_sl1s_file(self):
         """Main validation function that runs all checks"""
@@ -29,11 +56,27 @@ class SL1SSanitizer:
         if self.errors:
             return self._generate_report()
             
-        self._check_zip_structure()
-        self._check_required_files()
-        self._extract_config()
-        self._check_image_files()
-        self._check_config_consistency()
+        # Open the archive once and share it across the checks.
+        # Opening only parses the central directory; nothing is decompressed until a member
+        # is opened. The checks work from infolist() metadata alone, and config.ini is the one
+        # member ever read - don't add read()/testzip() calls here, since decompressing every
+        # layer image would dominate the run time on large archives.
+        try:
+            with zipfile.ZipFile(self.sl1s_file_path, 'r') as zip_ref:
+                self._zf = zip_ref
+                self._classify_entries(zip_ref.infolist())
+                
+                self._check_zip_structure()
+                self._check_required_files()
+                self._extract_config()
+                self._check_image_files()
+                self._check_config_consistency()
+        except zipfile.BadZipFile:
+            self.errors.append("File is not a valid ZIP archive")
+        except Exception as e:
+            self.errors.append(f"Error reading ZIP file: {str(e)}")
+        finally:
+            self._zf = None
         
         return self._generate_report()
     
@@ -42,220 +85,241 @@ class SL1SSanitizer:
         if not self.sl1s_file_path.exists():
             self.errors.append(f"SL1S file not found: {self.sl1s_file_path}")
     
+    def _classify_entries(self, infos):
+        """Sort archive entries into the groups the checks need, in a single pass"""
+        has_root_entry = False
+        subfolders = set()
+        by_basename = {}
+        # Layer names and their lowercased forms, kept as parallel lists
+        layer_images = []
+        layer_lowers = []
+        
+        for info in infos:
+            # Directory entries carry no files, and ZipInfo already knows which they are
+            if info.is_dir():
+                continue
+            name = info.filename
+            slash = name.find('/')
+            if slash != -1:
+                # Files directly in root or in a single subfolder count as root entries;
+                # one is enough, so stop looking for a second slash once it's found
+                if not has_root_entry and name.find('/', slash + 1) == -1:
+                    has_root_entry = True
+                # Ignore thumbnail and preview folders as they are standard
+                if not name.startswith(_PREVIEW_PREFIXES):
+                    subfolders.add(name[:slash])
+            else:
+                has_root_entry = True
+                # Layer images live in root, so only root entries need the extension test
+                lower_name = name.lower()
+                if lower_name.endswith(_LAYER_EXTENSIONS):
+                    layer_images.append(name)
+                    layer_lowers.append(lower_name)
+            
+            # Index by basename (first one wins) so required files in root or in any
+            # subfolder can be looked up directly (excluding thumbnails)
+            if not name.startswith(_THUMBNAIL_PREFIX):
+                basename = name if slash == -1 else name[name.rfind('/') + 1:]
+                by_basename.setdefault(basename, name)
+        
+        self._has_root_entry = has_root_entry
+        self._subfolders = subfolders
+        self._by_basename = by_basename
+        self._layer_images = layer_images
+        self._layer_lowers = layer_lowers
+    
     def _check_zip_structure(self):
         """Check if zip file has proper structure (no subfolder at root)"""
-        try:
-            with zipfile.ZipFile(self.sl1s_file_path, 'r') as zip_ref:
-                # Get all file paths in the zip
-                file_list = zip_ref.namelist()
-                
-                # Check if there's a single subfolder containing all files
-                root_files = [f for f in file_list if '/' not in f or f.count('/') == 1]
-                if not root_files:
-                    self.errors.append("Zip file appears to be empty or has nested folder structure")
-                    return
-                
-                # Check if files are directly in root or in a single subfolder
-                # Ignore thumbnail and preview folders as they are standard
-                has_subfolder = any('/' in f and not f.startswith(('thumbnail/', 'preview/')) for f in file_list)
-                if has_subfolder:
-                    # Get all folder names, excluding thumbnail and preview folders
-                    folders = {f.split('/')[0] for f in file_list if '/' in f and not f.startswith(('thumbnail/', 'preview/'))}
-                    if folders:
-                        for folder_name in folders:
-                            self.warnings.append(f"Files are contained in subfolder '{folder_name}'. This may cause issues with some slicers.")
-        except zipfile.BadZipFile:
-            self.errors.append("File is not a valid ZIP archive")
-        except Exception as e:
-            self.errors.append(f"Error reading ZIP file: {str(e)}")
+        # Check if there's a single subfolder containing all files
+        if not self._has_root_entry:
+            self.errors.append("Zip file appears to be empty or has nested folder structure")
+            return
+        
+        # Check if files are directly in root or in a single subfolder
+        for folder_name in self._subfolders:
+            self.warnings.append(f"Files are contained in subfolder '{folder_name}'. This may cause issues with some slicers.")
     
     def _check_required_files(self):
         """Check if required files (config.ini, prusaslicer.ini) are present"""
         required_files = ['config.ini', 'prusaslicer.ini']
         
-        try:
-            with zipfile.ZipFile(self.sl1s_file_path, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                
-                for required_file in required_files:
-                    # Check if file exists in root or in any subfolder (excluding thumbnails)
-                    found = any(required_file in f and f.endswith(required_file) and not f.startswith('thumbnail/') for f in file_list)
-                    if not found:
-                        self.errors.append(f"Required file missing: {required_file}")
-        except Exception as e:
-            self.errors.append(f"Error checking required files: {str(e)}")
+        for required_file in required_files:
+            if required_file not in self._by_basename:
+                self.errors.append(f"Required file missing: {required_file}")
     
     def _extract_config(self):
         """Extract and parse config.ini file - handle different formats"""
         try:
-            with zipfile.ZipFile(self.sl1s_file_path, 'r') as zip_ref:
-                # Find config.ini in the archive (excluding thumbnail folder)
-                config_files = [f for f in zip_ref.namelist() if f.endswith('config.ini') and not f.startswith('thumbnail/')]
-                if not config_files:
-                    self.errors.append("config.ini file not found in archive")
-                    return
+            # Use the first config.ini found in the archive (excluding thumbnail folder)
+            config_file = self._by_basename.get('config.ini')
+            if not config_file:
+                self.errors.append("config.ini file not found in archive")
+                return
+            
+            # Stream the file through the parser instead of decoding it into one string
+            with self._zf.open(config_file, 'r') as raw, io.TextIOWrapper(raw, encoding='utf-8') as f:
+                # Look past leading blank/comment lines to see whether the file starts with a section
+                head = []
+                for line in f:
+                    head.append(line)
+                    stripped = line.strip()
+                    if stripped and not stripped.startswith(('#', ';')):
+                        break
                 
-                # Use the first config.ini found
-                config_file = config_files[0]
-                with zip_ref.open(config_file) as f:
-                    config_content = f.read().decode('utf-8')
+                if not head or not head[-1].lstrip().startswith('['):
+                    # Simple key=value format without sections - parse it under a default section
+                    head.insert(0, '[DEFAULT]\n')
                 
-                # Try to parse as standard INI format first
-                self.config = configparser.ConfigParser()
-                try:
-                    self.config.read_string(config_content)
-                except configparser.MissingSectionHeaderError:
-                    # If it fails, it might be a simple key=value format without sections
-                    # Let's create a default section and parse it
-                    self.config = configparser.ConfigParser()
-                    wrapped_content = '[DEFAULT]\n' + config_content
-                    self.config.read_string(wrapped_content)
-                    
-        except Exception as e:
+                # SL1S configs are flat key = value pairs: no interpolation, no ':' delimiter,
+                # no multi-line values, and duplicate keys shouldn't abort parsing
+                self.config = configparser.ConfigParser(interpolation=None, strict=False,
+                                                        empty_lines_in_values=False, delimiters=('=',))
+                self.config.read_file(itertools.chain(head, f), source=config_file)
+                
+        except (zipfile.BadZipFile, zlib.error, lzma.LZMAError, EOFError, OSError, RuntimeError,
+                ValueError, configparser.Error) as e:
+            # Corrupt/truncated/encrypted member, undecodable text or malformed INI
             self.errors.append(f"Error reading config.ini: {str(e)}")
+            # ParsingError is only raised once the parsed values have been joined into strings;
+            # any other failure leaves the parser half-filled with raw value lists, so drop it
+            if type(e) is not configparser.ParsingError:
+                self.config = None
+        
+        if self.config is not None:
+            self._index_config()
     
-    def _is_thumbnail_or_preview_file(self, file_path):
-        """Check if file is a thumbnail or preview (should be ignored for validation)"""
-        return file_path.startswith(('thumbnail/', 'preview/'))
+    def _index_config(self):
+        """Flatten all config sections into one dict so lookups are a single probe"""
+        # Earlier sections take precedence: layerRenderParams, then DEFAULT (files
+        # without explicit sections), then any other section that has the key
+        ordered = []
+        if self.config.has_section('layerRenderParams'):
+            ordered.append(self.config['layerRenderParams'])
+        ordered.append(self.config.defaults())
+        ordered.extend(self.config[sec] for sec in self.config.sections() if sec != 'layerRenderParams')
+        
+        self._config_flat = {}
+        for values in ordered:
+            for key, value in values.items():
+                self._config_flat.setdefault(key, value)
+        
+        # numFast is read up front so the image check can tell when the layer count is already wrong
+        num_fast_str = self._get_config_value('numFast')
+        if num_fast_str:
+            try:
+                self._num_fast = int(num_fast_str)
+            except ValueError:
+                self.errors.append("numFast in config.ini is not a valid integer")
     
-    def _is_layer_image(self, file_path):
-        """Check if file is a layer image (should be validated)"""
-        # Layer images are typically in root or in a job folder, not in thumbnail/preview folders
-        return (file_path.lower().endswith(('.png', '.jpg', '.jpeg')) 
-                and not self._is_thumbnail_or_preview_file(file_path)
-                and not '/' in file_path)  # Layer images are usually in root
+    def _parse_layer_name(self, filename, lower):
+        """Split a layer filename into (base name, layer number), or None if it isn't name#####.ext"""
+        # The layout is fixed, so suffix checks (on the precomputed lowercase name) and
+        # slicing replace a regex match
+        for ext in _LAYER_EXTENSIONS:
+            if lower.endswith(ext):
+                stem = filename[:-len(ext)]
+                num_part = stem[-5:]
+                if len(stem) > 5 and num_part.isascii() and num_part.isdigit():
+                    return stem[:-5], _parse_five_digits(num_part)
+                return None
+        return None
+    
+    def _find_missing_numbers(self, present, first, last):
+        """Return the layer numbers between first and last that are unset in the presence bitmap"""
+        # bytearray.find skips over runs of present layers in C
+        missing = []
+        gap = present.find(0, first, last)
+        while gap != -1:
+            missing.append(gap)
+            gap = present.find(0, gap + 1, last)
+        return missing
     
     def _check_image_files(self):
         """Check image files for proper naming and numbering - only layer images, not thumbnails"""
-        try:
-            with zipfile.ZipFile(self.sl1s_file_path, 'r') as zip_ref:
-                # Find all layer image files (excluding thumbnails and previews)
-                image_files = [f for f in zip_ref.namelist() if self._is_layer_image(f)]
-                self.image_files = image_files
-                
-                if not image_files:
-                    self.warnings.append("No layer image files found in archive")
-                    return
-                
-                # Extract base name and check numbering
-                pattern = r'(.+?)(\d{5})\.(png|jpg|jpeg)$'
-                
-                base_names = set()
-                numbers = []
-                
-                for img_file in image_files:
-                    # Get just the filename for pattern matching (remove path)
-                    filename = os.path.basename(img_file)
-                    match = re.search(pattern, filename, re.IGNORECASE)
-                    if not match:
-                        self.errors.append(f"Layer image file doesn't match naming pattern (should be name#####.png): {img_file}")
-                        continue
-                    
-                    base_name = match.group(1)
-                    number_str = match.group(2)
-                    
-                    base_names.add(base_name)
-                    numbers.append(int(number_str))
-                
-                # Check for consistent base names
-                if len(base_names) > 1:
-                    self.errors.append(f"Multiple image base names found: {base_names}. All layer images should have the same base name.")
-                
-                # Check numbering sequence
-                if numbers:
-                    numbers.sort()
-                    expected_sequence = list(range(numbers[0], numbers[0] + len(numbers)))
-                    
-                    if numbers != expected_sequence:
-                        missing = set(expected_sequence) - set(numbers)
-                        if missing:
-                            self.errors.append(f"Missing layer image numbers: {sorted(missing)}")
-                    
-                    # Check if starts with 00000
-                    if numbers[0] != 0:
-                        self.warnings.append(f"Layer image numbering doesn't start at 00000 (starts at {numbers[0]:05d})")
-                    
-                    # Check for five-digit format
-                    for num in numbers:
-                        if num < 0 or num > 99999:
-                            self.errors.append(f"Layer image number out of five-digit range: {num}")
-                
-        except Exception as e:
-            self.errors.append(f"Error checking image files: {str(e)}")
-    
-    def _get_config_value(self, section, key, default=None):
-        """Safely get config value, handling different section formats"""
-        if not self.config:
-            return default
+        # Find all layer image files (excluding thumbnails and previews)
+        image_files = self._layer_images
+        self.image_files = image_files
         
-        # Try the specified section first
-        if self.config.has_section(section) and key in self.config[section]:
-            return self.config[section][key]
+        if not image_files:
+            self.warnings.append("No layer image files found in archive")
+            return
+        
+        # Extract base name and check numbering
+        base_names = set()
+        # Layer numbers are bounded, so a presence bitmap replaces a sorted list: the first and
+        # last set bytes give the range, and unset bytes in between are the gaps
+        present = bytearray(_LAYER_NUMBER_LIMIT)
         
-        # Try DEFAULT section (for files without explicit sections)
-        if self.config.has_section('DEFAULT') and key in self.config['DEFAULT']:
-            return self.config['DEFAULT'][key]
+        # Layer images are root entries, so the entry name is already the bare filename
+        for index, (img_file, lower) in enumerate(zip(image_files, self._layer_lowers)):
+            parsed = self._parse_layer_name(img_file, lower)
+            if not parsed:
+                self.errors.append(f"Layer image file doesn't match naming pattern (should be name#####.png): {img_file}")
+                continue
+            
+            base_name, number = parsed
+            # jobDir is compared against the first layer image only, and only if it parses
+            if index == 0:
+                self._layer_base = base_name
+            
+            base_names.add(base_name)
+            present[number] = 1
         
-        # Try any section that might contain the key
-        for sec in self.config.sections():
-            if key in self.config[sec]:
-                return self.config[sec][key]
+        # Check for consistent base names
+        if len(base_names) > 1:
+            self.errors.append(f"Multiple image base names found: {base_names}. All layer images should have the same base name.")
         
-        return default
+        # Check numbering sequence
+        first = present.find(1)
+        if first != -1:
+            last = present.rfind(1)
+            self._last_layer_number = last
+            # If numFast already disagrees with the image count the archive is known to be
+            # broken (reported by _check_config_consistency), so skip the gap search
+            if self._num_fast is None or self._num_fast == len(image_files):
+                missing = self._find_missing_numbers(present, first, last)
+                if missing:
+                    self.errors.append(f"Missing layer image numbers: {missing}")
+            
+            # Check if starts with 00000
+            if first != 0:
+                self.warnings.append(f"Layer image numbering doesn't start at 00000 (starts at {first:05d})")
+    
+    def _get_config_value(self, key, default=None):
+        """Safely get config value, whichever section it was defined in"""
+        # The parser stores keys lowercased
+        return self._config_flat.get(key.lower(), default)
     
     def _check_config_consistency(self):
         """Check consistency between config.ini and image files"""
         if not self.config:
             return
             
-        try:
-            # Check jobDir matches image base name
-            job_dir = self._get_config_value('layerRenderParams', 'jobDir')
-            if job_dir:
-                if self.image_files:
-                    # Extract base name from first layer image
-                    first_image = self.image_files[0]
-                    filename = os.path.basename(first_image)
-                    pattern = r'(.+?)\d{5}\.(png|jpg|jpeg)$'
-                    match = re.search(pattern, filename, re.IGNORECASE)
-                    
-                    if match:
-                        image_base = match.group(1).rstrip('_').rstrip('-')
-                        config_base = job_dir.rstrip('_').rstrip('-')
-                        
-                        if image_base != config_base:
-                            self.errors.append(f"Layer image base name '{image_base}' doesn't match jobDir '{config_base}' in config.ini")
+        # Check jobDir matches image base name
+        job_dir = self._get_config_value('jobDir')
+        if job_dir:
+            # Base name of the first layer image, as parsed by _check_image_files
+            # (None if that image doesn't match the naming pattern)
+            if self._layer_base is not None:
+                image_base = self._layer_base.rstrip('_').rstrip('-')
+                config_base = job_dir.rstrip('_').rstrip('-')
+                
+                if image_base != config_base:
+                    self.errors.append(f"Layer image base name '{image_base}' doesn't match jobDir '{config_base}' in config.ini")
+        
+        # Check numFast (parsed by _extract_config) matches total number of layer images
+        num_fast = self._num_fast
+        if num_fast is not None:
+            image_count = len(self.image_files)
             
-            # Check numFast matches total number of layer images
-            num_fast_str = self._get_config_value('layerRenderParams', 'numFast')
-            if num_fast_str:
-                try:
-                    num_fast = int(num_fast_str)
-                    image_count = len(self.image_files)
-                    
-                    if num_fast != image_count:
-                        self.errors.append(f"numFast in config.ini ({num_fast}) doesn't match number of layer image files ({image_count})")
-                    
-                    # Verify that last image number is numFast-1
-                    if self.image_files:
-                        pattern = r'.+?(\d{5})\.(png|jpg|jpeg)$'
-                        numbers = []
-                        for img_file in self.image_files:
-                            filename = os.path.basename(img_file)
-                            match = re.search(pattern, filename, re.IGNORECASE)
-                            if match:
-                                numbers.append(int(match.group(1)))
-                        
-                        if numbers:
-                            max_number = max(numbers)
-                            if max_number != num_fast - 1:
-                                self.errors.append(f"Last layer image number ({max_number}) doesn't match numFast-1 ({num_fast - 1})")
-                                
-                except ValueError:
-                    self.errors.append("numFast in config.ini is not a valid integer")
-                    
-        except Exception as e:
-            self.errors.append(f"Error checking config consistency: {str(e)}")
+            if num_fast != image_count:
+                self.errors.append(f"numFast in config.ini ({num_fast}) doesn't match number of layer image files ({image_count})")
+            
+            # Verify that last image number is numFast-1 (as found by _check_image_files)
+            if self._last_layer_number is not None:
+                max_number = self._last_layer_number
+                if max_number != num_fast - 1:
+                    self.errors.append(f"Last layer image number ({max_number}) doesn't match numFast-1 ({num_fast - 1})")
     
     def _generate_report(self):
         """Generate validation report"""
@@ -1 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the SL1S sanitizer - builds small SL1S archives on the fly and checks the report
+Run with: python -m unittest test
+"""
 
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from sl1s_sanitizer import SL1SSanitizer
+
+class SanitizerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+
+    def make_archive(self, entries, name='test.sl1s'):
+        """Write a zip archive from a {name: content} dict and return its path"""
+        path = os.path.join(self._tmpdir.name, name)
+        with zipfile.ZipFile(path, 'w') as zf:
+            for entry_name, content in entries.items():
+                zf.writestr(entry_name, content)
+        return path
+
+    def make_sl1s(self, config, layer_numbers, base='Cube_Test'):
+        """Build an archive with the given config.ini text and layer image numbers"""
+        entries = {'config.ini': config, 'prusaslicer.ini': ''}
+        for number in layer_numbers:
+            entries[f'{base}{number:05d}.png'] = ''
+        return self.make_archive(entries)
+
+    def validate(self, path):
+        """Run the sanitizer quietly and return it with its result"""
+        sanitizer = SL1SSanitizer(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            is_valid = sanitizer.validate_sl1s_file()
+        return sanitizer, is_valid
+
+class TestImageFiles(SanitizerTestCase):
+    def test_valid_sequence(self):
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Cube_Test\nnumFast = 3\n', range(3))
+        sanitizer, is_valid = self.validate(path)
+        self.assertTrue(is_valid)
+        self.assertEqual(sanitizer.errors, [])
+
+    def test_missing_numbers_cover_every_gap(self):
+        # The old range-based check only looked at 0..len-1 and reported [2, 4] here
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Cube_Test\n', [0, 1, 3, 6, 7])
+        sanitizer, is_valid = self.validate(path)
+        self.assertFalse(is_valid)
+        self.assertIn("Missing layer image numbers: [2, 4, 5]", sanitizer.errors)
+
+    def test_numbering_not_starting_at_zero(self):
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Cube_Test\nnumFast = 3\n', [1, 2, 3])
+        sanitizer, _ = self.validate(path)
+        self.assertEqual(sanitizer.warnings, ["Layer image numbering doesn't start at 00000 (starts at 00001)"])
+        self.assertEqual(sanitizer.errors, ["Last layer image number (3) doesn't match numFast-1 (2)"])
+
+    def test_highest_layer_number(self):
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Cube_Test\n', [99997, 99999])
+        sanitizer, _ = self.validate(path)
+        self.assertIn("Missing layer image numbers: [99998]", sanitizer.errors)
+
+class TestConfigConsistency(SanitizerTestCase):
+    def test_job_dir_mismatch(self):
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Other\n', range(2))
+        sanitizer, _ = self.validate(path)
+        self.assertIn("Layer image base name 'Cube_Test' doesn't match jobDir 'Other' in config.ini", sanitizer.errors)
+
+    def test_job_dir_skipped_when_first_image_is_misnamed(self):
+        # Only the first layer image is compared against jobDir, as before
+        path = self.make_archive({
+            'config.ini': '[layerRenderParams]\njobDir = Other\n',
+            'prusaslicer.ini': '',
+            'aaa.png': '',
+            'Cube_Test00000.png': '',
+        })
+        sanitizer, _ = self.validate(path)
+        self.assertFalse(any('jobDir' in error for error in sanitizer.errors), sanitizer.errors)
+
+class TestHeaderlessConfig(SanitizerTestCase):
+    # PrusaSlicer writes config.ini without section headers. Before the flattened config
+    # lookup these keys were never found, so every case below passed validation.
+    def test_bundled_sample_is_valid(self):
+        sample = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Cube_Testfu.sl1s')
+        sanitizer, is_valid = self.validate(sample)
+        self.assertTrue(is_valid, sanitizer.errors)
+
+    def test_num_fast_mismatch(self):
+        path = self.make_sl1s('jobDir = Cube_Test\nnumFast = 4\n', range(3))
+        sanitizer, is_valid = self.validate(path)
+        self.assertFalse(is_valid)
+        self.assertEqual(sanitizer.errors, [
+            "numFast in config.ini (4) doesn't match number of layer image files (3)",
+            "Last layer image number (2) doesn't match numFast-1 (3)",
+        ])
+
+    def test_num_fast_not_an_integer(self):
+        path = self.make_sl1s('jobDir = Cube_Test\nnumFast = abc\n', range(3))
+        sanitizer, is_valid = self.validate(path)
+        self.assertFalse(is_valid)
+        self.assertEqual(sanitizer.errors, ["numFast in config.ini is not a valid integer"])
+
+    def test_job_dir_mismatch(self):
+        path = self.make_sl1s('jobDir = Other\nnumFast = 2\n', range(2))
+        sanitizer, _ = self.validate(path)
+        self.assertEqual(sanitizer.errors, ["Layer image base name 'Cube_Test' doesn't match jobDir 'Other' in config.ini"])
+
+class TestConfigErrors(SanitizerTestCase):
+    def test_decode_error_after_first_chunk(self):
+        # The bad byte sits past the decoder's first chunk, so parsing has already started
+        config = b'numFast = 2\njobDir = Cube_Test\n' + b'# padding\n' * 1000 + b'bad = \xff\n'
+        path = self.make_sl1s(config, [0, 2])
+        sanitizer, is_valid = self.validate(path)
+        self.assertFalse(is_valid)
+        self.assertIsNone(sanitizer.config)
+        self.assertEqual(len(sanitizer.errors), 2, sanitizer.errors)
+        self.assertTrue(sanitizer.errors[0].startswith("Error reading config.ini:"))
+        # The image check still runs after a failed config read
+        self.assertEqual(sanitizer.errors[1], "Missing layer image numbers: [1]")
+
+    def test_decode_error_without_num_fast(self):
+        config = b'jobDir = Other\n' + b'# padding\n' * 1000 + b'bad = \xff\n'
+        path = self.make_sl1s(config, range(2))
+        sanitizer, is_valid = self.validate(path)
+        self.assertFalse(is_valid)
+        self.assertEqual(len(sanitizer.errors), 1, sanitizer.errors)
+        self.assertTrue(sanitizer.errors[0].startswith("Error reading config.ini:"))
+
+    def test_parsing_error_keeps_parsed_values(self):
+        path = self.make_sl1s('[layerRenderParams]\njobDir = Other\nnot a key value line\n', range(2))
+        sanitizer, _ = self.validate(path)
+        self.assertTrue(sanitizer.errors[0].startswith("Error reading config.ini:"))
+        self.assertIn("Layer image base name 'Cube_Test' doesn't match jobDir 'Other' in config.ini", sanitizer.errors)
+
+if __name__ == '__main__':
+    unittest.main()